@@ -46,6 +46,8 @@ class ComplexDecimal(object):
 		return result
 	
 	def __pow__(self, powerNumerator:Decimal, powerDenominator:Decimal=1):
+		if type(powerNumerator) is int and powerDenominator == 1:
+			return self.int_pow(powerNumerator)
 		if self.imag != 0:
 			raise NotImplementedError("Power function not implemented for complex numbers with non-zero imaginary part")
 		if self.real < 0 and powerDenominator % 2 == 0:
@@ -60,6 +62,20 @@ class ComplexDecimal(object):
 		
 		
 	
+	def int_pow(self, exponent:int):
+		# binary exponentiation, so z**k costs O(log k) multiplications
+		if exponent < 0:
+			return ComplexDecimal(1) / self.int_pow(-exponent)
+		result = ComplexDecimal(1)
+		base = ComplexDecimal(self)
+		while exponent:
+			if exponent & 1:
+				result = result * base
+			exponent >>= 1
+			if exponent:
+				base = base * base
+		return result
+
 	def __neg__(self):
 		result = ComplexDecimal(self)
 		result.real = -self.real
@@ -0,0 +1,380 @@
+#!.venv/bin/python
+
+"""
+Local job server for π estimation
+---------------------------------
+
+A long-lived asyncio HTTP service that runs estimation jobs on a bounded
+process pool, so callers avoid paying interpreter start-up and the heavy
+imports for every request. It listens on localhost (or a Unix socket) only.
+
+Jobs
+  {"method": "linear-distance", "n": 1000, "pow": 4, "precision": 40, "radius": "1"}
+      `method` is any name in the estimator registry (see registry.py), and
+      the job runs as registry.get(method).run(circle, n, pow, precision);
+      everything but `method` is optional, with the pithon.py CLI defaults
+
+Endpoints
+  POST /jobs              submit a job; identical in-flight jobs share one id
+  GET  /jobs/<id>         job state, progress and result
+  GET  /jobs/<id>/events  newline-delimited JSON stream of progress events
+  GET  /metrics           queue depth, counters and latency percentiles
+
+When more than --max-queue jobs are waiting, new submissions get 503.
+
+Usage
+  python pi_server.py --port 8765 --workers 4
+  curl -d '{"method": "nilakantha", "n": 1000}' localhost:8765/jobs
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing as mp
+import sys
+import time
+from argparse import ArgumentParser
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+import registry
+
+
+class Progress:
+	# stand-in for tqdm inside the workers: forwards roughly one update per
+	# percent of the estimator's main loop to the server instead of drawing a
+	# bar; sub-loops, marked like transient bars with leave=False, are not
+	# reported so `total` always refers to the main loop
+
+	def __init__(self, queue, job_id, iterable=None, total=None, leave=True, **kwargs):
+		self.queue = queue
+		self.job_id = job_id
+		self.iterable = iterable
+		self.report = leave
+		if total is None and hasattr(iterable, '__len__'):
+			total = len(iterable)
+		self.total = total
+
+	def __iter__(self):
+		if not self.report:
+			yield from self.iterable
+			return
+		step = max(1, (self.total or 100) // 100)
+		done = 0
+		for item in self.iterable:
+			yield item
+			done += 1
+			if done % step == 0:
+				self.queue.put((self.job_id, done, self.total))
+		self.queue.put((self.job_id, done, self.total))
+
+
+def run_job(job_id, spec, progress_queue):
+	# executed in a pool worker process
+	import pithon
+	entry = registry.get(spec['method'])
+	entry.load()
+	progress = partial(Progress, progress_queue, job_id)
+	for name in ('pithon', 'poly'):
+		if name in sys.modules:
+			sys.modules[name].tqdm = progress
+	circle = pithon.Circle(radius=Decimal(spec['radius']), precision=spec['precision'])
+	return str(entry.run(circle, spec['n'], spec['pow'], spec['precision']))
+
+
+def normalize_spec(spec) -> dict:
+	# validates a submitted job and fills in defaults, so that equivalent
+	# submissions compare equal for de-duplication
+	if not isinstance(spec, dict):
+		raise ValueError("job must be a JSON object")
+	method = spec.get('method')
+	try:
+		registry.get(method)
+	except KeyError as e:
+		raise ValueError(e.args[0])
+	n = spec.get('n', 1000)
+	pow = spec.get('pow', 4)
+	precision = spec.get('precision', 40)
+	for name, value in (('n', n), ('pow', pow), ('precision', precision)):
+		if type(value) is not int or value <= 0:
+			raise ValueError(f"{name} must be a positive integer")
+	try:
+		radius = Decimal(str(spec.get('radius', '1')))
+	except InvalidOperation:
+		raise ValueError("radius must be a number")
+	if not radius.is_finite() or radius <= 0:
+		raise ValueError("radius must be a positive number")
+	return {'method': method, 'n': n, 'pow': pow, 'precision': precision, 'radius': str(radius)}
+
+
+class Job:
+
+	def __init__(self, job_id:str, spec:dict):
+		self.id = job_id
+		self.spec = spec
+		self.state = 'queued'
+		self.done = 0
+		self.total = None
+		self.result = None
+		self.error = None
+		self.submitted = time.monotonic()
+		self.started = None
+		self.finished = None
+		self.listeners = []
+
+	def snapshot(self) -> dict:
+		return {
+			'id': self.id,
+			'state': self.state,
+			'spec': self.spec,
+			'progress': {'done': self.done, 'total': self.total},
+			'result': self.result,
+			'error': self.error,
+			'queue_seconds': None if self.started is None else self.started - self.submitted,
+			'run_seconds': None if self.finished is None or self.started is None else self.finished - self.started,
+		}
+
+	def publish(self):
+		event = self.snapshot()
+		for listener in self.listeners:
+			listener.put_nowait(event)
+
+
+class JobServer:
+
+	def __init__(self, workers:int = 2, max_queue:int = 64, history:int = 1000):
+		if workers < 1 or max_queue < 1:
+			raise ValueError("workers and max_queue must be positive")
+		self.workers = workers
+		self.max_queue = max_queue
+		self.jobs = OrderedDict()
+		self.in_flight = {}
+		# the event loop only keeps weak references to tasks
+		self.tasks = set()
+		self.history = history
+		self.ids = itertools.count(1)
+		self.counters = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+		self.queue_latency = deque(maxlen=1000)
+		self.run_latency = deque(maxlen=1000)
+		self.total_latency = deque(maxlen=1000)
+
+	async def start(self):
+		context = mp.get_context('spawn')
+		self.manager = context.Manager()
+		self.progress_queue = self.manager.Queue()
+		self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+		self.slots = asyncio.Semaphore(self.workers)
+		self.progress_task = asyncio.create_task(self.read_progress())
+
+	async def close(self):
+		self.progress_queue.put(None)
+		await self.progress_task
+		self.pool.shutdown(wait=True, cancel_futures=True)
+		self.manager.shutdown()
+
+	async def read_progress(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			message = await loop.run_in_executor(None, self.progress_queue.get)
+			if message is None:
+				return
+			job_id, done, total = message
+			job = self.jobs.get(job_id)
+			if job is not None and job.state == 'running':
+				job.done = done
+				job.total = total
+				job.publish()
+
+	def queue_depth(self) -> int:
+		return sum(1 for job in self.in_flight.values() if job.state == 'queued')
+
+	def submit(self, spec:dict):
+		# returns (job, deduplicated); raises OverflowError when the queue is full
+		spec = normalize_spec(spec)
+		key = json.dumps(spec, sort_keys=True)
+		job = self.in_flight.get(key)
+		if job is not None:
+			self.counters['deduplicated'] += 1
+			return job, True
+		if self.queue_depth() >= self.max_queue:
+			self.counters['rejected'] += 1
+			raise OverflowError("job queue is full")
+		job = Job(str(next(self.ids)), spec)
+		self.jobs[job.id] = job
+		self.in_flight[key] = job
+		self.counters['submitted'] += 1
+		task = asyncio.create_task(self.run(key, job))
+		self.tasks.add(task)
+		task.add_done_callback(self.tasks.discard)
+		return job, False
+
+	async def run(self, key:str, job:Job):
+		loop = asyncio.get_running_loop()
+		async with self.slots:
+			job.state = 'running'
+			job.started = time.monotonic()
+			job.publish()
+			try:
+				job.result = await loop.run_in_executor(self.pool, run_job, job.id, job.spec, self.progress_queue)
+				# progress messages may still be queued behind the result; a
+				# finished job is complete, including estimators (such as the
+				# closed-form rotational polygon) that have no main loop
+				if not job.total:
+					job.total = 1
+				job.done = job.total
+				job.state = 'done'
+				self.counters['completed'] += 1
+			except Exception as e:
+				job.error = f'{type(e).__name__}: {e}'
+				job.state = 'failed'
+				self.counters['failed'] += 1
+			job.finished = time.monotonic()
+		del self.in_flight[key]
+		self.queue_latency.append(job.started - job.submitted)
+		self.run_latency.append(job.finished - job.started)
+		self.total_latency.append(job.finished - job.submitted)
+		job.publish()
+		while len(self.jobs) > self.history:
+			oldest = next(iter(self.jobs.values()))
+			if oldest.state in ('queued', 'running'):
+				break
+			self.jobs.popitem(last=False)
+
+	def metrics(self) -> dict:
+		return {
+			'queue_depth': self.queue_depth(),
+			'running': sum(1 for job in self.in_flight.values() if job.state == 'running'),
+			'workers': self.workers,
+			'max_queue': self.max_queue,
+			**self.counters,
+			'latency_seconds': {
+				'queue': latency_summary(self.queue_latency),
+				'run': latency_summary(self.run_latency),
+				'total': latency_summary(self.total_latency),
+			},
+		}
+
+	async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+		try:
+			method, path, body = await read_request(reader)
+			await self.route(method, path, body, writer)
+		except (ValueError, json.JSONDecodeError) as e:
+			await respond(writer, 400, {'error': str(e)})
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+	async def route(self, method:str, path:str, body:bytes, writer:asyncio.StreamWriter):
+		parts = [part for part in path.split('?')[0].split('/') if part]
+		if method == 'POST' and parts == ['jobs']:
+			try:
+				job, deduplicated = self.submit(json.loads(body or b'{}'))
+			except OverflowError as e:
+				await respond(writer, 503, {'error': str(e)})
+				return
+			await respond(writer, 202, {'id': job.id, 'deduplicated': deduplicated, 'state': job.state})
+		elif method == 'GET' and parts == ['metrics']:
+			await respond(writer, 200, self.metrics())
+		elif method == 'GET' and len(parts) == 2 and parts[0] == 'jobs' and parts[1] in self.jobs:
+			await respond(writer, 200, self.jobs[parts[1]].snapshot())
+		elif method == 'GET' and len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events' and parts[1] in self.jobs:
+			await self.stream_events(self.jobs[parts[1]], writer)
+		else:
+			await respond(writer, 404, {'error': 'not found'})
+
+	async def stream_events(self, job:Job, writer:asyncio.StreamWriter):
+		# no Content-Length: the body is a stream of JSON lines ended by closing
+		writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n')
+		listener = asyncio.Queue()
+		job.listeners.append(listener)
+		try:
+			event = job.snapshot()
+			while True:
+				writer.write(json.dumps(event).encode() + b'\n')
+				await writer.drain()
+				if event['state'] in ('done', 'failed'):
+					return
+				event = await listener.get()
+		finally:
+			job.listeners.remove(listener)
+
+
+def latency_summary(samples) -> dict:
+	if not samples:
+		return {'count': 0}
+	ordered = sorted(samples)
+	def percentile(p):
+		return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+	return {
+		'count': len(ordered),
+		'mean': sum(ordered) / len(ordered),
+		'p50': percentile(0.50),
+		'p95': percentile(0.95),
+		'max': ordered[-1],
+	}
+
+
+async def read_request(reader:asyncio.StreamReader):
+	request_line = (await reader.readline()).decode('latin-1').strip()
+	if not request_line:
+		raise ConnectionError("empty request")
+	try:
+		method, path, _ = request_line.split(' ', 2)
+	except ValueError:
+		raise ValueError("malformed request line")
+	length = 0
+	while True:
+		line = (await reader.readline()).decode('latin-1').strip()
+		if not line:
+			break
+		name, _, value = line.partition(':')
+		if name.strip().lower() == 'content-length':
+			length = int(value.strip())
+	body = await reader.readexactly(length) if length else b''
+	return method.upper(), path, body
+
+
+async def respond(writer:asyncio.StreamWriter, status:int, payload:dict):
+	reasons = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 503: 'Service Unavailable'}
+	body = json.dumps(payload).encode()
+	writer.write(
+		f'HTTP/1.1 {status} {reasons[status]}\r\n'
+		f'Content-Type: application/json\r\n'
+		f'Content-Length: {len(body)}\r\n'
+		f'Connection: close\r\n\r\n'.encode() + body
+	)
+	await writer.drain()
+
+
+async def serve(host:str = '127.0.0.1', port:int = 8765, unix:str = None, workers:int = 2, max_queue:int = 64):
+	server = JobServer(workers=workers, max_queue=max_queue)
+	await server.start()
+	if unix is not None:
+		listener = await asyncio.start_unix_server(server.handle, path=unix)
+		print(f'Serving π estimation jobs on {unix}')
+	else:
+		listener = await asyncio.start_server(server.handle, host, port)
+		print(f'Serving π estimation jobs on http://{host}:{port}')
+	try:
+		async with listener:
+			await listener.serve_forever()
+	finally:
+		await server.close()
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Local job server for π estimation')
+	parser.add_argument('--host', default='127.0.0.1', help='address to bind (localhost by default)')
+	parser.add_argument('--port', type=int, default=8765)
+	parser.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+	parser.add_argument('--workers', '-w', type=int, default=2, help='size of the process pool')
+	parser.add_argument('--max-queue', type=int, default=64, help='queued jobs before new ones are rejected')
+	args = parser.parse_args()
+
+	try:
+		asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.max_queue))
+	except KeyboardInterrupt:
+		pass
@@ -1,11 +1,34 @@
 #!.venv/bin/python
 
 from argparse import ArgumentParser
-from decimal import Decimal, getcontext
-from tqdm import tqdm
-import matplotlib.pyplot as plt
+from decimal import Decimal, getcontext, localcontext
+from functools import wraps
+import inspect
+import sys
 
 from complex_decimal import ComplexDecimal
+import registry
+from result_cache import ResultCache, get_cache, set_cache, source_version
+
+
+def tqdm(*args, **kwargs):
+	# tqdm is imported on first use so that importing this module stays cheap
+	from tqdm import tqdm as progress_bar
+	return progress_bar(*args, **kwargs)
+
+
+# methods run by --multi, in report order
+MULTI_METHODS = [
+	'monte-carlo',
+	'rectangular',
+	'trapezoidal',
+	'linear-distance',
+	'rotational-polygon',
+	'polygonal',
+	'wallis',
+	'newton-leibniz',
+	'nilakantha',
+]
 
 
 class Circle:
@@ -28,8 +51,63 @@ class Circle:
 			return result
 		else:
 			raise TypeError("x must be a Decimal")
+
+	@staticmethod
+	def unit_f(x:Decimal) -> Decimal:
+		# f on the unit circle; the estimators work on it so that their cost
+		# depends only on n, and scale by the radius only for output
+		if type(x) is Decimal:
+			if x < 0 or x > 1:
+				raise ValueError("x must be in [0, 1]")
+			getcontext().prec += 2
+			result = (Decimal(1) - x**2).sqrt()
+			getcontext().prec -= 2
+			return result
+		else:
+			raise TypeError("x must be a Decimal")
 		
 
+def cached_estimate(estimate):
+	# looks the run up in the persistent result cache before computing it;
+	# the precision is the `prec` argument when there is one, otherwise the
+	# decimal context precision the estimate would run at
+	signature = inspect.signature(estimate)
+
+	@wraps(estimate)
+	def wrapper(self, *args, **kwargs):
+		cache = get_cache()
+		if cache is None:
+			return estimate(self, *args, **kwargs)
+		bound = signature.bind(self, *args, **kwargs)
+		bound.apply_defaults()
+		params = dict(bound.arguments)
+		del params['self']
+		if 'prec' in params:
+			precision = int(params.pop('prec'))
+		else:
+			precision = getcontext().prec
+		key = ResultCache.make_key({
+			'estimator': type(self).__name__,
+			'method': estimate.__name__,
+			'params': params,
+			'radius': str(self.circle.radius),
+			# ComplexDecimal arithmetic feeds RotationalPolygon, so it is versioned too
+			'version': [source_version(__file__), source_version(inspect.getsourcefile(ComplexDecimal))],
+		})
+		hit = cache.lookup(key, precision)
+		if hit is not None:
+			if 'prec' in signature.parameters:
+				getcontext().prec = precision
+			with localcontext() as ctx:
+				ctx.prec = precision
+				return +Decimal(hit[1])
+		result = estimate(self, *args, **kwargs)
+		cache.store(key, precision, str(result))
+		return result
+
+	return wrapper
+
+
 class PiEstimator:
 
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
@@ -43,6 +121,11 @@ class PiEstimator:
 	def estimate(self, n:int) -> Decimal:
 		raise NotImplementedError("Subclasses must implement this method")
 
+	@classmethod
+	def run(cls, circle:Circle, n:int, pow:int, prec:int, **options) -> Decimal:
+		# uniform entry point for the estimator registry
+		return cls(circle=circle).estimate(n)
+
 
 class LinearDistance(PiEstimator):
 
@@ -52,58 +135,62 @@ class LinearDistance(PiEstimator):
 	def get_n_dec(self, n:int, pow:int, prec:int) -> Decimal:
 		if pow <= 3:
 			raise ValueError("pow must be greater than 3")
-		else:
-			pow -= 2
 		getcontext().prec = prec + 2
 		n_dec = Decimal(n)
-		cos_expansion = Decimal(2).sqrt()
-		# getcontext().prec *= 6
-		# getcontext().prec = pow + prec
-		for i in tqdm(range(pow - 1)):
-			# getcontext().prec = prec_mod
-			# print(getcontext().prec)
-			# prec_mod -= 1
-			cos_expansion = (Decimal(2) + cos_expansion).sqrt()
-			# getcontext().prec -= prec_mod
-		# getcontext().prec = prec + 2
+		cos_expansion = LinearDistance.cos_expansion(pow)
 		n_dec = n_dec / (Decimal(0.5) * (Decimal(2) - cos_expansion).sqrt())
 		getcontext().prec = prec
-		# getcontext().prec = int(getcontext().prec / 6)
 		return n_dec
 
+	@classmethod
+	def run(cls, circle:Circle, n:int, pow:int, prec:int, **options) -> Decimal:
+		return cls(circle=circle).estimate(n, pow, prec)
+
+	@staticmethod
+	def cos_expansion(pow:int) -> Decimal:
+		# 2 * cos(pi / 2^(pow - 1)) as the nested radical sqrt(2 + sqrt(2 + ...)),
+		# starting from 2 * cos(pi) = -2
+		cos_expansion = Decimal(-2)
+		# a short sub-loop of the estimate: its bar is transient (leave=False)
+		for i in tqdm(range(pow - 1), leave=False):
+			cos_expansion = (Decimal(2) + cos_expansion).sqrt()
+		return cos_expansion
+
 
+	@cached_estimate
 	def estimate(self, n:int, pow:int, prec:int) -> Decimal:
 		getcontext().prec = prec + 2
 		arclen = Decimal(0.0)
 		x1 = Decimal(0.0)
-		y1 = self.circle.f(x1)
+		y1 = Circle.unit_f(x1)
 		n_dec = self.get_n_dec(n, pow, prec)
 		getcontext().prec = prec + 2
-		for i in tqdm(range(int(self.circle.radius) * n)):
+		for i in tqdm(range(n)):
 			x2 = (Decimal(i) + Decimal(1)) / n_dec
-			y2 = self.circle.f(x2)
+			y2 = Circle.unit_f(x2)
 			arclen += LinearDistance.pythag(x2 - x1, y2 - y1)
 			x1 = x2
 			y1 = y2
-		pi = Decimal(2).__pow__(Decimal(pow)) * arclen / self.circle.radius
+		pi = Decimal(2).__pow__(Decimal(pow)) * arclen
 		getcontext().prec = prec
 		return +pi
 	
 	def graph_estimate(self, n:int):
+		radius = self.circle.radius
 		circum = Decimal(0.0)
 		x1 = Decimal(0.0)
-		y1 = self.circle.f(x1)
-		xs = [x1]
-		ys = [y1]
-		for i in range(int(self.circle.radius) * n):
+		y1 = Circle.unit_f(x1)
+		xs = [float(x1 * radius)]
+		ys = [float(y1 * radius)]
+		for i in range(n):
 			x2 = Decimal(i + 1) / n
-			y2 = self.circle.f(x2)
-			xs.append(float(x2))
-			ys.append(float(y2))
+			y2 = Circle.unit_f(x2)
+			xs.append(float(x2 * radius))
+			ys.append(float(y2 * radius))
 			circum += LinearDistance.pythag(x2 - x1, y2 - y1)
 			x1 = x2
 			y1 = y2
-		return circum / (self.circle.radius / Decimal(2)), xs, ys
+		return circum * Decimal(2), xs, ys
 	
 	@staticmethod
 	def pythag(a:Decimal, b:Decimal) -> Decimal:
@@ -113,18 +200,98 @@ class LinearDistance(PiEstimator):
 		return c
 	
 
+class RotationalPolygon(LinearDistance):
+
+	def __init__(self, radius:Decimal = None, circle:Circle = None):
+		super().__init__(radius, circle)
+
+	def get_arc_unit(self, pow:int, prec:int) -> ComplexDecimal:
+		# cos(pi / 2^pow) + i * sin(pi / 2^pow) from the same nested radical as get_n_dec
+		if pow < 1:
+			raise ValueError("pow must be at least 1")
+		getcontext().prec = prec + 2
+		cos_expansion = LinearDistance.cos_expansion(pow)
+		arc_unit = ComplexDecimal((Decimal(2) + cos_expansion).sqrt() / Decimal(2))
+		arc_unit.imag = (Decimal(2) - cos_expansion).sqrt() / Decimal(2)
+		return arc_unit
+
+	def get_unit_root(self, n:int, pow:int, prec:int) -> ComplexDecimal:
+		# principal n-th root of the arc unit, i.e. the rotation by pi / (n * 2^pow),
+		# refined by Newton's method from a float starting guess
+		import math
+		if n < 1:
+			raise ValueError("n must be positive")
+		arc_unit = self.get_arc_unit(pow, prec)
+		if n == 1:
+			return arc_unit
+		getcontext().prec = prec + 4
+		angle = math.atan2(float(arc_unit.imag), float(arc_unit.real)) / n
+		root = ComplexDecimal(Decimal(math.cos(angle)))
+		root.imag = Decimal(math.sin(angle))
+		tolerance = Decimal(10) ** -(prec + 2)
+		for _ in range(64):
+			next_root = (root * Decimal(n - 1) + arc_unit / root**(n - 1)) / Decimal(n)
+			delta = abs(next_root - root)
+			root = next_root
+			if delta < tolerance:
+				break
+		getcontext().prec = prec + 2
+		return root
+
+	def vertices(self, n:int, pow:int, prec:int, resync:int = 256):
+		# walk the unit polygon by repeated rotation; every `resync` vertices
+		# the accumulated rounding drift is discarded by recomputing root^k
+		root = self.get_unit_root(n, pow, prec)
+		vertex = ComplexDecimal(1)
+		yield vertex
+		for k in range(1, n + 1):
+			if k % resync == 0:
+				vertex = root**k
+			else:
+				vertex = vertex * root
+			yield vertex
+
+	@cached_estimate
+	def estimate(self, n:int, pow:int, prec:int) -> Decimal:
+		# the vertices are equally spaced, so every chord has length |root - 1|
+		root = self.get_unit_root(n, pow, prec)
+		arclen = Decimal(n) * abs(root - ComplexDecimal(1))
+		pi = Decimal(2).__pow__(Decimal(pow)) * arclen
+		getcontext().prec = prec
+		return +pi
+
+	def graph_estimate(self, n:int):
+		# quarter circle (pow = 1) walked vertex by vertex on the unit circle;
+		# the radius is only applied to the plotted points
+		prec = getcontext().prec
+		radius = self.circle.radius
+		circum = Decimal(0.0)
+		xs = []
+		ys = []
+		previous = None
+		for vertex in self.vertices(n, 1, prec):
+			xs.append(float(vertex.real * radius))
+			ys.append(float(vertex.imag * radius))
+			if previous is not None:
+				circum += LinearDistance.pythag(vertex.real - previous.real, vertex.imag - previous.imag)
+			previous = vertex
+		getcontext().prec = prec
+		return +(circum * Decimal(2)), xs, ys
+
+
 class RectangularArea(PiEstimator):
 
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		area = Decimal(0.0)
-		for i in tqdm(range(int(self.circle.radius) * n)):
+		for i in tqdm(range(n)):
 			x = Decimal(i + 1) / n
-			y = self.circle.f(x)
+			y = Circle.unit_f(x)
 			area += y / n
-		return area * 4 / (self.circle.radius**2)
+		return area * 4
 	
 
 class TrapezoidalArea(PiEstimator):
@@ -132,17 +299,18 @@ class TrapezoidalArea(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		area = Decimal(0.0)
 		x1 = Decimal(0.0)
-		y1 = self.circle.f(x1)
-		for i in tqdm(range(int(self.circle.radius) * n)):
+		y1 = Circle.unit_f(x1)
+		for i in tqdm(range(n)):
 			x2 = Decimal(i + 1) / n
-			y2 = self.circle.f(x2)
+			y2 = Circle.unit_f(x2)
 			area += (y1 + y2) / (2 * n)
 			x1 = x2
 			y1 = y2
-		return area * 4 / (self.circle.radius**2)
+		return area * 4
 
 
 class MonteCarloArea(PiEstimator):
@@ -166,6 +334,7 @@ class WallisProduct(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		product = Decimal(1.0)
 		for i in tqdm(range(1, n + 1)):
@@ -180,6 +349,7 @@ class NewtonLeibniz(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		getcontext().prec += 2
 		pi = Decimal(0.0)
@@ -195,6 +365,7 @@ class Nilakantha(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		getcontext().prec += 2
 		pi = Decimal(3.0)
@@ -213,6 +384,7 @@ class Ramanujan(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 		
+	@cached_estimate
 	def estimate(self, n:int) -> Decimal:
 		getcontext().prec += 2
 		factorial_4n = Decimal(1)
@@ -237,6 +409,11 @@ class Polygonal(PiEstimator):
 	def __init__(self, radius:Decimal = None, circle:Circle = None):
 		super().__init__(radius, circle)
 
+	@classmethod
+	def run(cls, circle:Circle, n:int, pow:int, prec:int, **options) -> Decimal:
+		return cls(circle=circle).estimate(n, prec)
+
+	@cached_estimate
 	def estimate(self, iterations, prec):
 		# iterations = number of doublings (m)
 		# prec = decimal precision in digits
@@ -271,6 +448,9 @@ class Polygonal(PiEstimator):
 
 if __name__ == "__main__":
 
+	# the registry imports estimators from `pithon`; reuse this module for it
+	sys.modules.setdefault('pithon', sys.modules[__name__])
+
 	parser = ArgumentParser()
 	parser.add_argument('-n', '--iterations', action='store')
 	parser.add_argument('-r', '--radius', action='store')
@@ -278,11 +458,19 @@ if __name__ == "__main__":
 	parser.add_argument('-e', '--pow', action='store')
 	parser.add_argument('--graph', action='store_true')
 	parser.add_argument('--multi', action='store_true')
+	parser.add_argument('-m', '--method', action='store', help=f'comma-separated methods to run: {", ".join(registry.names())}')
 	parser.add_argument('--animate', action='store_true')
+	parser.add_argument('--no-cache', action='store_true')
 	parser.add_argument('-d', '--delay', action='store')
 	parser.add_argument('-s', '--step', action='store')
 	args = parser.parse_args()
 
+	if args.method is not None and args.multi:
+		parser.error('--method cannot be combined with --multi')
+
+	if args.no_cache:
+		set_cache(None)
+
 	if args.iterations is not None:
 		n = int(args.iterations)
 	else:
@@ -326,45 +514,45 @@ if __name__ == "__main__":
 	if not graph:
 
 		if multi:
-
-			print(f'Estimating π with Monte Carlo method where n = {n}')
-			mc_pi = MonteCarloArea(circle=circle).estimate(n)
-			print(f'Estimating π with Rectangular Area method where n = {n}')
-			ra_pi = RectangularArea(circle=circle).estimate(n)
-			print(f'Estimating π with Trapezoidal Area method where n = {n}')
-			ta_pi = TrapezoidalArea(circle=circle).estimate(n)
-			print(f'Estimating π with Linear Distance method where n = {n}')
-			ld_pi = LinearDistance(circle=circle).estimate(n, pow, precision)
-			print(f'Estimating π with Polygonal method where n = {n}')
-			pg_pi = Polygonal(circle=circle).estimate(n, precision)
-			print(f'Estimating π with Wallis Product method where n = {n}')
-			wp_pi = WallisProduct(circle=circle).estimate(n)
-			print(f'Estimating π with Newton-Leibniz method where n = {n}')
-			nl_pi = NewtonLeibniz(circle=circle).estimate(n)
-			print(f'Estimating π with Nilakantha method where n = {n}')
-			nk_pi = Nilakantha(circle=circle).estimate(n)
-			# print(f'Estimating π with Ramanujan method where n = {n}')
-			# rk_pi = Ramanujan(circle=circle).estimate(n)
-
-			print(f'Monte Carlo Area:   {mc_pi:.{precision}f}   error: {Decimal(100.0) * abs(mc_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Rectangular Area:   {ra_pi:.{precision}f}   error: {Decimal(100.0) * abs(ra_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Trapezoidal Area:   {ta_pi:.{precision}f}   error: {Decimal(100.0) * abs(ta_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Linear Distance:    {ld_pi:.{precision}f}   error: {Decimal(100.0) * abs(ld_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Polygonal:          {pg_pi:.{precision}f}   error: {Decimal(100.0) * abs(pg_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Wallis Product:     {wp_pi:.{precision}f}   error: {Decimal(100.0) * abs(wp_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Newton-Leibniz:     {nl_pi:.{precision}f}   error: {Decimal(100.0) * abs(nl_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Nilakantha:         {nk_pi:.{precision}f}   error: {Decimal(100.0) * abs(nk_pi - pi) / pi:.{precision - 2}f} %')
-			# print(f'Ramanujan:          {rk_pi:.{precision}f}   error: {Decimal(100.0) * abs(rk_pi - pi) / pi:.{precision - 2}f} %')
-
+			methods = MULTI_METHODS
+		elif args.method is not None:
+			methods = [name.strip() for name in args.method.split(',') if name.strip()]
+			if not methods:
+				parser.error('--method needs at least one method name')
 		else:
-
-			print(f'Estimating π with Linear Distance method where n = {n}')
-			ld_pi = LinearDistance(circle=circle).estimate(n, pow, precision)
-			# print(f'Linear Distance:    {ld_pi:.{precision}f}   \nerror: {Decimal(100.0) * abs(ld_pi - pi) / pi:.{precision - 2}f} %')
-			print(f'Estimated Pi: {ld_pi}')
+			methods = ['linear-distance']
+
+		entries = []
+		for name in methods:
+			try:
+				entries.append(registry.get(name))
+			except KeyError as e:
+				parser.error(e.args[0])
+
+		estimates = []
+		for entry in entries:
+			print(f'Estimating π with {entry.label} method where n = {n}')
+			estimates.append(entry.run(circle, n, pow, precision))
+
+		if len(entries) == 1 and not multi:
+			print(f'Estimated Pi: {estimates[0]}')
+		else:
+			for entry, estimate in zip(entries, estimates):
+				print(f'{entry.label + ":":<20}{estimate:.{precision}f}   error: {Decimal(100.0) * abs(estimate - pi) / pi:.{precision - 2}f} %')
 
 	else:
 
+		import matplotlib.pyplot as plt
+
+		graph_estimators = {'linear-distance': LinearDistance, 'rotational-polygon': RotationalPolygon}
+		if args.method is None:
+			graph_estimator = LinearDistance
+		elif args.method in graph_estimators:
+			graph_estimator = graph_estimators[args.method]
+		else:
+			parser.error(f'--graph supports --method {" or ".join(graph_estimators)}')
+		graph_label = registry.get(args.method or 'linear-distance').label
+
 		cir_x = []
 		cir_y = []
 
@@ -382,8 +570,8 @@ if __name__ == "__main__":
 				fig, ax = plt.subplots(num='Linear Distance π Estimate Animation')
 				while True:
 					for i in range(1, n + 1, step):
-						est, xs, ys = LinearDistance(circle=circle).graph_estimate(i)
-						print(f'Linear Distance:    {est:.28f}   n={i}')
+						est, xs, ys = graph_estimator(circle=circle).graph_estimate(i)
+						print(f'{graph_label + ":":<20}{est:.28f}   n={i}')
 						fig.suptitle(f'Estimate π with {i} segments = {est:.8f}')
 						ax.clear()
 						ax.plot(cir_x, cir_y, label='y=sqrt(1 - x**2)', color='red', linestyle='dashed')
@@ -395,16 +583,16 @@ if __name__ == "__main__":
 					plt.ioff()
 			else:
 				for i in range(n, 0, -1):
-					est, xs, ys = LinearDistance(circle=circle).graph_estimate(i)
-					print(f'Linear Distance:    {est:.28f}   n={i}')
+					est, xs, ys = graph_estimator(circle=circle).graph_estimate(i)
+					print(f'{graph_label + ":":<20}{est:.28f}   n={i}')
 					fig, ax = plt.subplots(num=f'Linear Distance π Estimate with n={i}')
 					ax.plot(cir_x, cir_y, label='y=sqrt(1 - x**2)', color='red', linestyle='dashed')
 					ax.plot(xs, ys, label='Estimated Circle Arc', color='blue')
 					ax.grid(True)
 					fig.gca().set_aspect('equal', adjustable='box')
 		else:
-			est, xs, ys = LinearDistance(circle=circle).graph_estimate(n)
-			print(f'Linear Distance:    {est:.28f}   n={n}')
+			est, xs, ys = graph_estimator(circle=circle).graph_estimate(n)
+			print(f'{graph_label + ":":<20}{est:.28f}   n={n}')
 			fig, ax = plt.subplots(num=f'Linear Distance π Estimate with n={n}')
 			ax.plot(cir_x, cir_y, label='y=sqrt(1 - x**2)', color='red', linestyle='dashed', width=3)
 			ax.plot(xs, ys, label='Estimated Circle Arc', color='blue', alpha=0.5)
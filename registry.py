@@ -0,0 +1,70 @@
+"""
+Estimator registry
+------------------
+
+Maps short method names (as used by `pithon.py --method`) to the code that
+runs them. Targets are given as "module:attribute" strings and imported
+only when the method is first used, so listing or selecting methods does
+not pull in gmpy2, and a run only imports what it needs.
+
+A target is called as target(circle, n, pow, prec, **options) and returns
+a Decimal; PiEstimator.run provides this for the estimator classes. Other
+modules can add methods with register().
+"""
+
+from dataclasses import dataclass, field
+from importlib import import_module
+
+
+@dataclass
+class EstimatorEntry:
+	name: str
+	label: str
+	target: str
+	_loaded: object = field(default=None, repr=False)
+
+	def load(self):
+		if self._loaded is None:
+			module_name, _, attr_path = self.target.partition(':')
+			loaded = import_module(module_name)
+			for attr in attr_path.split('.'):
+				loaded = getattr(loaded, attr)
+			self._loaded = loaded
+		return self._loaded
+
+	def run(self, circle, n:int, pow:int, prec:int, **options):
+		return self.load()(circle, n, pow, prec, **options)
+
+
+_registry = {}
+
+
+def register(name:str, label:str, target:str) -> EstimatorEntry:
+	if ':' not in target:
+		raise ValueError("target must look like 'module:attribute'")
+	entry = EstimatorEntry(name, label, target)
+	_registry[name] = entry
+	return entry
+
+
+def get(name:str) -> EstimatorEntry:
+	try:
+		return _registry[name]
+	except KeyError:
+		raise KeyError(f"unknown method {name!r}; choose from {', '.join(names())}") from None
+
+
+def names() -> list:
+	return list(_registry)
+
+
+register('monte-carlo', 'Monte Carlo Area', 'pithon:MonteCarloArea.run')
+register('rectangular', 'Rectangular Area', 'pithon:RectangularArea.run')
+register('trapezoidal', 'Trapezoidal Area', 'pithon:TrapezoidalArea.run')
+register('linear-distance', 'Linear Distance', 'pithon:LinearDistance.run')
+register('rotational-polygon', 'Rotational Polygon', 'pithon:RotationalPolygon.run')
+register('polygonal', 'Polygonal', 'pithon:Polygonal.run')
+register('wallis', 'Wallis Product', 'pithon:WallisProduct.run')
+register('newton-leibniz', 'Newton-Leibniz', 'pithon:NewtonLeibniz.run')
+register('nilakantha', 'Nilakantha', 'pithon:Nilakantha.run')
+register('nested-polygon', 'Nested Polygon', 'poly:run')
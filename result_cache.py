@@ -0,0 +1,180 @@
+"""
+Persistent result cache for π estimator runs
+--------------------------------------------
+
+Results are stored in a SQLite file so several processes can share the
+cache safely (SQLite does the file locking). Entries are addressed by the
+SHA-256 of a canonical JSON description of the run (estimator, parameters,
+radius and a hash of the estimator's source file) plus the precision the
+value was computed at. A lookup is served by the lowest cached precision
+that is at least the requested one, so a higher-precision result can
+answer a lower-precision query. The file is kept under a byte budget by
+evicting the least recently used entries.
+
+Environment
+  PITHON_CACHE            set to 0/off/false/no to disable the cache
+  PITHON_CACHE_DIR        directory of the cache file (default ~/.cache/pithon)
+  PITHON_CACHE_MAX_BYTES  size budget for stored values (default 64 MiB)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import warnings
+from contextlib import contextmanager
+from functools import lru_cache
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResultCache:
+
+	def __init__(self, path:str, max_bytes:int = DEFAULT_MAX_BYTES):
+		if max_bytes <= 0:
+			raise ValueError("max_bytes must be positive")
+		self.path = path
+		self.max_bytes = max_bytes
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with self._connect() as conn:
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute(
+				'CREATE TABLE IF NOT EXISTS results ('
+				' key TEXT NOT NULL,'
+				' precision INTEGER NOT NULL,'
+				' value TEXT NOT NULL,'
+				' size INTEGER NOT NULL,'
+				' last_used REAL NOT NULL,'
+				' PRIMARY KEY (key, precision))'
+			)
+			conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+	@contextmanager
+	def _connect(self):
+		# one short-lived connection per operation keeps the cache fork-safe
+		conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+		try:
+			yield conn
+		finally:
+			conn.close()
+
+	@staticmethod
+	def make_key(description:dict) -> str:
+		canonical = json.dumps(description, sort_keys=True, separators=(',', ':'), default=str)
+		return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+	def get(self, key:str, precision:int):
+		# returns (cached precision, value) for the cheapest entry that is at
+		# least as precise as requested, or None
+		with self._connect() as conn:
+			conn.execute('BEGIN IMMEDIATE')
+			try:
+				row = conn.execute(
+					'SELECT precision, value FROM results WHERE key = ? AND precision >= ?'
+					' ORDER BY precision LIMIT 1',
+					(key, precision),
+				).fetchone()
+				if row is not None:
+					conn.execute(
+						'UPDATE results SET last_used = ? WHERE key = ? AND precision = ?',
+						(time.time(), key, row[0]),
+					)
+				conn.execute('COMMIT')
+			except BaseException:
+				conn.execute('ROLLBACK')
+				raise
+		return row
+
+	def put(self, key:str, precision:int, value:str):
+		size = len(key) + len(value)
+		if size > self.max_bytes:
+			return
+		with self._connect() as conn:
+			conn.execute('BEGIN IMMEDIATE')
+			try:
+				# a more precise entry makes the less precise ones redundant
+				conn.execute('DELETE FROM results WHERE key = ? AND precision <= ?', (key, precision))
+				conn.execute(
+					'INSERT INTO results (key, precision, value, size, last_used) VALUES (?, ?, ?, ?, ?)',
+					(key, precision, value, size, time.time()),
+				)
+				self._evict(conn)
+				conn.execute('COMMIT')
+			except BaseException:
+				conn.execute('ROLLBACK')
+				raise
+
+	def lookup(self, key:str, precision:int):
+		# get() for callers that must not fail: a broken cache is a miss
+		try:
+			return self.get(key, precision)
+		except (sqlite3.Error, OSError) as e:
+			warnings.warn(f'result cache lookup failed: {e}', RuntimeWarning)
+			return None
+
+	def store(self, key:str, precision:int, value:str):
+		# put() for callers that must not fail: the computed value is kept
+		# by the caller even if it cannot be cached
+		try:
+			self.put(key, precision, value)
+		except (sqlite3.Error, OSError) as e:
+			warnings.warn(f'result cache store failed: {e}', RuntimeWarning)
+
+	def _evict(self, conn:sqlite3.Connection):
+		total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+		while total > self.max_bytes:
+			row = conn.execute(
+				'SELECT key, precision, size FROM results ORDER BY last_used LIMIT 1'
+			).fetchone()
+			if row is None:
+				break
+			conn.execute('DELETE FROM results WHERE key = ? AND precision = ?', (row[0], row[1]))
+			total -= row[2]
+
+	def clear(self):
+		with self._connect() as conn:
+			conn.execute('DELETE FROM results')
+
+	def size(self) -> int:
+		with self._connect() as conn:
+			return conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def source_version(path:str) -> str:
+	# code version of an estimator: editing its source invalidates its entries
+	with open(path, 'rb') as f:
+		return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+_cache = None
+_configured = False
+
+
+def get_cache():
+	global _cache, _configured
+	if not _configured:
+		_configured = True
+		if os.environ.get('PITHON_CACHE', '1').lower() in ('0', 'off', 'false', 'no'):
+			_cache = None
+		else:
+			directory = os.environ.get('PITHON_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pithon'))
+			try:
+				max_bytes = int(os.environ.get('PITHON_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+				_cache = ResultCache(os.path.join(directory, 'results.sqlite3'), max_bytes)
+			except (OSError, sqlite3.Error, ValueError) as e:
+				# the cache is optional: run uncached rather than fail the computation
+				warnings.warn(f'result cache disabled: {e}', RuntimeWarning)
+				_cache = None
+	return _cache
+
+
+def set_cache(cache):
+	# pass None to disable caching for this process
+	global _cache, _configured
+	_cache = cache
+	_configured = True